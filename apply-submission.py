@@ -3,23 +3,235 @@
 Apply submission features on top of commit 14c5b71.
 Adds: GitHub Gist writeup, writeupUrl, /submission endpoint, new stage meta.
 """
+import mmap
 import os
+from pathlib import Path
 
-def replace_in(path, old, new):
-    content = open(path).read()
-    if old not in content:
+try:
+    import ahocorasick  # optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Edits are applied in memory; each touched file is read once and
+# written once by flush() at the end of the script. Contents stay as raw
+# bytes (an mmap until first edited), so files are never UTF-8 decoded.
+FILE_CACHE: dict[str, bytes | mmap.mmap] = {}
+DIRTY: set[str] = set()
+
+_DIR_CACHE: set[str] = set()
+
+def ensure_dir(path):
+    if path in _DIR_CACHE:
+        return
+    os.makedirs(path, exist_ok=True)
+    _DIR_CACHE.add(path)
+
+def load(path):
+    if path not in FILE_CACHE:
+        with open(path, 'rb') as f:
+            try:
+                FILE_CACHE[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file cannot be mapped
+                FILE_CACHE[path] = b""
+    return FILE_CACHE[path]
+
+def find_anchor(content, old):
+    """Offset of old in content, or -1. A short prefix probe rejects misses early."""
+    i = content.find(old[:32])
+    if i < 0:
+        return -1
+    if content[i:i + len(old)] != old:
+        i = content.find(old, i + 1)
+    return i
+
+def _splice_sequential(content, edits):
+    applied = set()
+    for n, (old, new) in enumerate(edits):
+        i = find_anchor(content, old)
+        if i < 0:
+            continue
+        content = content[:i] + new + content[i + len(old):]
+        applied.add(n)
+    return content, applied
+
+def _splice_automaton(content, edits):
+    """Locate every anchor in one pass over content. Anchors must not overlap."""
+    # latin-1 maps bytes 1:1 to code points, so match offsets are byte offsets.
+    A = ahocorasick.Automaton()
+    for n, (old, new) in enumerate(edits):
+        A.add_word(old.decode("latin-1"), (n, old, new))
+    A.make_automaton()
+    out, last_end, applied = [], 0, set()
+    for end, (n, old, new) in A.iter(content[:].decode("latin-1")):
+        start = end - len(old) + 1
+        if n in applied or start < last_end:
+            continue
+        out.append(content[last_end:start])
+        out.append(new)
+        last_end = end + 1
+        applied.add(n)
+    out.append(content[last_end:])
+    return b"".join(out), applied
+
+def multi_replace(path, edits):
+    """Apply (old, new) edits to path in order; each old is replaced once."""
+    edits = [(old.encode(), new.encode()) for old, new in edits]
+    original = load(path)
+    # The automaton build only pays off once there are a few anchors.
+    if ahocorasick is not None and len(edits) > 2:
+        content, applied = _splice_automaton(original, edits)
+    else:
+        content, applied = _splice_sequential(original, edits)
+    if applied:
+        if isinstance(original, mmap.mmap):
+            original.close()
+        FILE_CACHE[path] = content
+        DIRTY.add(path)
+    for _ in range(len(edits) - len(applied)):
         print(f"  ⚠ Pattern not found in {path}, skipping")
-        return False
-    content = content.replace(old, new, 1)
-    open(path, 'w').write(content)
-    print(f"  ✅ {path}")
-    return True
+    if applied:
+        print(f"  ✅ {path} ({len(applied)}/{len(edits)} edits)")
+    return len(applied)
+
+def replace_in(path, old, new):
+    return multi_replace(path, [(old, new)]) == 1
+
+def flush():
+    for path in sorted(DIRTY):
+        tmp = Path(f"{path}.tmp")
+        tmp.write_bytes(FILE_CACHE[path])
+        tmp.replace(path)
+    DIRTY.clear()
+    for content in FILE_CACHE.values():
+        if isinstance(content, mmap.mmap):
+            content.close()
+    FILE_CACHE.clear()
+
+# ═══════════════════════════════════════════════════════════════
+# Templates — encoded once at import; written verbatim (no newline
+# translation). Built via .encode() because the body is not pure ASCII.
+# ═══════════════════════════════════════════════════════════════
+ROUTE_TS = ('''import { NextRequest, NextResponse } from "next/server";
+import { prisma } from "@/lib/db";
+import { validateApiKey, errorResponse } from "@/lib/api-key";
+import { getStorage } from "@solaudit/storage";
+
+/**
+ * GET /api/audits/[id]/submission
+ *
+ * Returns submission-ready URLs for a completed audit:
+ *   - prUrl: the PR link to the target repo (the fix)
+ *   - writeupUrl: the writeup doc link (findings + impact + proof)
+ *
+ * These two URLs are what\\'s required for the "Audit & Fix" bounty submission.
+ */
+export async function GET(
+  request: NextRequest,
+  { params }: { params: { id: string } }
+) {
+  const authErr = validateApiKey(request);
+  if (authErr) return authErr;
+
+  try {
+    const job = await prisma.auditJob.findUnique({
+      where: { id: params.id },
+      include: {
+        artifacts: {
+          where: {
+            OR: [
+              { metadata: { path: ["purpose"], equals: "bounty_submission" } },
+              { type: "ADVISORY" },
+              { name: { contains: "submission" } },
+            ],
+          },
+        },
+        findings: {
+          orderBy: { severity: "asc" },
+        },
+      },
+    });
+
+    if (!job) {
+      return errorResponse("Audit not found", 404);
+    }
+
+    if (job.status !== "SUCCEEDED") {
+      return NextResponse.json(
+        {
+          ready: false,
+          status: job.status,
+          error: `Audit is ${job.status} — must be SUCCEEDED to submit`,
+        },
+        { status: 400 }
+      );
+    }
+
+    const summary = job.summary as any;
+
+    // Extract URLs from the run summaries
+    let prUrl: string | null = null;
+    let writeupUrl: string | null = null;
+
+    if (summary?.runs) {
+      for (const run of summary.runs) {
+        if (run.prUrl) prUrl = run.prUrl;
+        if (run.writeupUrl) writeupUrl = run.writeupUrl;
+      }
+    }
+
+    // Fallback: get writeup from R2 signed URL
+    let writeupR2Url: string | null = null;
+    const writeupArtifact = job.artifacts.find(
+      (a) =>
+        a.name.includes("submission") ||
+        (a.metadata as any)?.purpose === "bounty_submission"
+    );
+
+    if (writeupArtifact) {
+      try {
+        const storage = getStorage();
+        writeupR2Url = await storage.getSignedUrl(writeupArtifact.objectKey, 86400);
+      } catch {}
+    }
+
+    const ready = !!prUrl && !!(writeupUrl || writeupR2Url);
+    const findingsSummary = job.findings.map((f) => ({
+      severity: f.severity,
+      title: f.title,
+      classId: f.classId,
+      className: f.className,
+      confidence: f.confidence,
+      proofStatus: f.proofStatus,
+    }));
+
+    return NextResponse.json({
+      ready,
+      auditId: job.id,
+      repoUrl: job.repoUrl,
+      status: job.status,
+      prUrl,
+      writeupUrl: writeupUrl || writeupR2Url,
+      writeupGistUrl: writeupUrl,
+      writeupR2Url,
+      findings: findingsSummary,
+      findingsCount: job.findings.length,
+      message: ready
+        ? "Submission ready. Use prUrl and writeupUrl for the bounty API call."
+        : `Missing: ${!prUrl ? "PR link" : ""}${!prUrl && !(writeupUrl || writeupR2Url) ? " + " : ""}${!(writeupUrl || writeupR2Url) ? "writeup link" : ""}`,
+    });
+  } catch (err: any) {
+    console.error("GET /api/audits/[id]/submission error:", err);
+    return errorResponse("Failed to get submission info", 500);
+  }
+}
+''').encode("utf-8")
 
 # ═══════════════════════════════════════════════════════════════
 # 1. GitHub Client — add createGist + publishWriteup
 # ═══════════════════════════════════════════════════════════════
-print("\n1. Adding Gist support to GitHubClient...")
-replace_in("packages/github/src/index.ts",
+def step1():
+    print("\n1. Adding Gist support to GitHubClient...")
+    replace_in("packages/github/src/index.ts",
     '    console.log(`[github] PR: ${result.prUrl}`);\n    return result;\n  }\n\n  /**\n   * Search',
     '''    console.log(`[github] PR: ${result.prUrl}`);
     return result;
@@ -70,18 +282,17 @@ replace_in("packages/github/src/index.ts",
 # ═══════════════════════════════════════════════════════════════
 # 2. Orchestrator — add writeupUrl + gist publish step
 # ═══════════════════════════════════════════════════════════════
-print("\n2. Adding writeupUrl to orchestrator...")
-replace_in("packages/engine/src/agent/orchestrator.ts",
-    "  submissionDoc: string | null;\n  prUrl: string | null;",
-    "  submissionDoc: string | null;\n  prUrl: string | null;\n  writeupUrl: string | null;")
+def step2():
+    print("\n2. Adding writeupUrl + gist publish step to orchestrator...")
+    multi_replace("packages/engine/src/agent/orchestrator.ts", [
+    ("  submissionDoc: string | null;\n  prUrl: string | null;",
+     "  submissionDoc: string | null;\n  prUrl: string | null;\n  writeupUrl: string | null;"),
 
-replace_in("packages/engine/src/agent/orchestrator.ts",
-    "      submissionDoc: null,\n      prUrl: null,",
-    "      submissionDoc: null,\n      prUrl: null,\n      writeupUrl: null,")
+    ("      submissionDoc: null,\n      prUrl: null,",
+     "      submissionDoc: null,\n      prUrl: null,\n      writeupUrl: null,"),
 
-print("   Adding gist publish step after PR...")
-replace_in("packages/engine/src/agent/orchestrator.ts",
-    '''        } else if (config.submitPRs && validatedPatches.length === 0) {
+    # Gist publish step after PR
+    ('''        } else if (config.submitPRs && validatedPatches.length === 0) {
           await progress("pr", "Skipped PR: no validated patches to submit");
         }
 
@@ -104,19 +315,20 @@ replace_in("packages/engine/src/agent/orchestrator.ts",
           }
         }
 
-        await progress("done", `Completed ${repo.owner}/${repo.name}`);''')
+        await progress("done", `Completed ${repo.owner}/${repo.name}`);'''),
+    ])
 
 # ═══════════════════════════════════════════════════════════════
 # 3. Agent handler — add writeupUrl + new stage pcts
 # ═══════════════════════════════════════════════════════════════
-print("\n3. Updating agent-handler...")
-replace_in("apps/worker/src/agent-handler.ts",
-    "        prUrl: run.prUrl || null,\n        durationMs: run.durationMs || null,",
-    "        prUrl: run.prUrl || null,\n        writeupUrl: run.writeupUrl || null,\n        durationMs: run.durationMs || null,")
+def step3():
+    print("\n3. Updating agent-handler...")
+    multi_replace("apps/worker/src/agent-handler.ts", [
+    ("        prUrl: run.prUrl || null,\n        durationMs: run.durationMs || null,",
+     "        prUrl: run.prUrl || null,\n        writeupUrl: run.writeupUrl || null,\n        durationMs: run.durationMs || null,"),
 
-# Discover mode progress map
-replace_in("apps/worker/src/agent-handler.ts",
-    '''        clone: 20,
+    # Discover mode progress map
+    ('''        clone: 20,
         audit: 28,
         pipeline: 36,
         patch: 44,
@@ -141,11 +353,10 @@ replace_in("apps/worker/src/agent-handler.ts",
         submission_doc: 76,
         pr: 82,
         writeup: 86,
-        done: 90,''')
+        done: 90,'''),
 
-# Single repo mode progress map
-replace_in("apps/worker/src/agent-handler.ts",
-    '''        clone: 15,
+    # Single repo mode progress map
+    ('''        clone: 15,
         audit: 25,
         pipeline: 35,
         found: 40,
@@ -172,145 +383,42 @@ replace_in("apps/worker/src/agent-handler.ts",
         submission_doc: 78,
         pr: 85,
         writeup: 90,
-        done: 95,''')
+        done: 95,'''),
+    ])
 
 # ═══════════════════════════════════════════════════════════════
 # 4. Agent page — add new stage meta
 # ═══════════════════════════════════════════════════════════════
-print("\n4. Updating agent page UI stages...")
-replace_in("apps/web/src/app/agent/page.tsx",
-    '  "agent:patch":     { icon: "🔧", label: "Patching", color: "text-orange-400" },',
-    '''  "agent:patch":     { icon: "🔧", label: "Patching", color: "text-orange-400" },
+def step4():
+    print("\n4. Updating agent page UI stages...")
+    multi_replace("apps/web/src/app/agent/page.tsx", [
+    ('  "agent:patch":     { icon: "🔧", label: "Patching", color: "text-orange-400" },',
+     '''  "agent:patch":     { icon: "🔧", label: "Patching", color: "text-orange-400" },
   "agent:patch_author": { icon: "🤖", label: "Kimi patch author", color: "text-pink-400" },
   "agent:patch_validate": { icon: "✔", label: "Patch validation", color: "text-amber-400" },
   "agent:patch_retry": { icon: "🔄", label: "Patch retry", color: "text-orange-400" },
-  "agent:patch_error": { icon: "⚠", label: "Patch warning", color: "text-yellow-500" },''')
+  "agent:patch_error": { icon: "⚠", label: "Patch warning", color: "text-yellow-500" },'''),
 
-replace_in("apps/web/src/app/agent/page.tsx",
-    '  "agent:pr_error":  { icon: "⚠", label: "PR warning", color: "text-yellow-500" },\n  "agent:done":',
-    '  "agent:pr_error":  { icon: "⚠", label: "PR warning", color: "text-yellow-500" },\n  "agent:writeup":   { icon: "📝", label: "Writeup gist", color: "text-indigo-400" },\n  "agent:writeup_error": { icon: "⚠", label: "Writeup warning", color: "text-yellow-500" },\n  "agent:done":')
+    ('  "agent:pr_error":  { icon: "⚠", label: "PR warning", color: "text-yellow-500" },\n  "agent:done":',
+     '  "agent:pr_error":  { icon: "⚠", label: "PR warning", color: "text-yellow-500" },\n  "agent:writeup":   { icon: "📝", label: "Writeup gist", color: "text-indigo-400" },\n  "agent:writeup_error": { icon: "⚠", label: "Writeup warning", color: "text-yellow-500" },\n  "agent:done":'),
+    ])
 
 # ═══════════════════════════════════════════════════════════════
 # 5. Submission endpoint — new file
 # ═══════════════════════════════════════════════════════════════
-print("\n5. Creating submission endpoint...")
-sub_dir = "apps/web/src/app/api/audits/[id]/submission"
-os.makedirs(sub_dir, exist_ok=True)
-open(f"{sub_dir}/route.ts", 'w').write('''import { NextRequest, NextResponse } from "next/server";
-import { prisma } from "@/lib/db";
-import { validateApiKey, errorResponse } from "@/lib/api-key";
-import { getStorage } from "@solaudit/storage";
-
-/**
- * GET /api/audits/[id]/submission
- *
- * Returns submission-ready URLs for a completed audit:
- *   - prUrl: the PR link to the target repo (the fix)
- *   - writeupUrl: the writeup doc link (findings + impact + proof)
- *
- * These two URLs are what\\'s required for the "Audit & Fix" bounty submission.
- */
-export async function GET(
-  request: NextRequest,
-  { params }: { params: { id: string } }
-) {
-  const authErr = validateApiKey(request);
-  if (authErr) return authErr;
-
-  try {
-    const job = await prisma.auditJob.findUnique({
-      where: { id: params.id },
-      include: {
-        artifacts: {
-          where: {
-            OR: [
-              { metadata: { path: ["purpose"], equals: "bounty_submission" } },
-              { type: "ADVISORY" },
-              { name: { contains: "submission" } },
-            ],
-          },
-        },
-        findings: {
-          orderBy: { severity: "asc" },
-        },
-      },
-    });
-
-    if (!job) {
-      return errorResponse("Audit not found", 404);
-    }
-
-    if (job.status !== "SUCCEEDED") {
-      return NextResponse.json(
-        {
-          ready: false,
-          status: job.status,
-          error: `Audit is ${job.status} — must be SUCCEEDED to submit`,
-        },
-        { status: 400 }
-      );
-    }
-
-    const summary = job.summary as any;
-
-    // Extract URLs from the run summaries
-    let prUrl: string | null = null;
-    let writeupUrl: string | null = null;
-
-    if (summary?.runs) {
-      for (const run of summary.runs) {
-        if (run.prUrl) prUrl = run.prUrl;
-        if (run.writeupUrl) writeupUrl = run.writeupUrl;
-      }
-    }
-
-    // Fallback: get writeup from R2 signed URL
-    let writeupR2Url: string | null = null;
-    const writeupArtifact = job.artifacts.find(
-      (a) =>
-        a.name.includes("submission") ||
-        (a.metadata as any)?.purpose === "bounty_submission"
-    );
-
-    if (writeupArtifact) {
-      try {
-        const storage = getStorage();
-        writeupR2Url = await storage.getSignedUrl(writeupArtifact.objectKey, 86400);
-      } catch {}
-    }
+def step5():
+    print("\n5. Creating submission endpoint...")
+    sub_dir = "apps/web/src/app/api/audits/[id]/submission"
+    ensure_dir(sub_dir)
+    Path(sub_dir, "route.ts").write_bytes(ROUTE_TS)
+    print("  ✅ Created submission route")
 
-    const ready = !!prUrl && !!(writeupUrl || writeupR2Url);
-    const findingsSummary = job.findings.map((f) => ({
-      severity: f.severity,
-      title: f.title,
-      classId: f.classId,
-      className: f.className,
-      confidence: f.confidence,
-      proofStatus: f.proofStatus,
-    }));
-
-    return NextResponse.json({
-      ready,
-      auditId: job.id,
-      repoUrl: job.repoUrl,
-      status: job.status,
-      prUrl,
-      writeupUrl: writeupUrl || writeupR2Url,
-      writeupGistUrl: writeupUrl,
-      writeupR2Url,
-      findings: findingsSummary,
-      findingsCount: job.findings.length,
-      message: ready
-        ? "Submission ready. Use prUrl and writeupUrl for the bounty API call."
-        : `Missing: ${!prUrl ? "PR link" : ""}${!prUrl && !(writeupUrl || writeupR2Url) ? " + " : ""}${!(writeupUrl || writeupR2Url) ? "writeup link" : ""}`,
-    });
-  } catch (err: any) {
-    console.error("GET /api/audits/[id]/submission error:", err);
-    return errorResponse("Failed to get submission info", 500);
-  }
-}
-''')
-print("  ✅ Created submission route")
+# Edits that succeeded are written even if a later step raises.
+try:
+    for step in (step1, step2, step3, step4, step5):
+        step()
+finally:
+    flush()
 
 print("\n✅ All submission features applied!")
 print("\nNew pipeline flow:")
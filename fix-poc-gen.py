@@ -1,16 +1,39 @@
 #!/usr/bin/env python3
 """Fix PoC generator: route through Kimi Code API, retry 400, sequential with delay."""
+from pathlib import Path
+
+# Edits are applied in memory; each touched file is read once and
+# written once by flush() at the end of the script.
+FILE_CACHE: dict[str, str] = {}
+DIRTY: set[str] = set()
+
+def find_anchor(content, old):
+    """Offset of old in content, or -1. A short prefix probe rejects misses early."""
+    i = content.find(old[:32])
+    if i < 0:
+        return -1
+    if content[i:i + len(old)] != old:
+        i = content.find(old, i + 1)
+    return i
 
 def replace_in(path, old, new):
-    content = open(path).read()
-    if old not in content:
+    if path not in FILE_CACHE:
+        FILE_CACHE[path] = Path(path).read_text(encoding='utf-8')
+    content = FILE_CACHE[path]
+    i = find_anchor(content, old)
+    if i < 0:
         print(f"  ⚠ Pattern not found in {path}")
         return False
-    content = content.replace(old, new, 1)
-    open(path, 'w').write(content)
+    FILE_CACHE[path] = content[:i] + new + content[i + len(old):]
+    DIRTY.add(path)
     print(f"  ✅ {path}")
     return True
 
+def flush():
+    for path in sorted(DIRTY):
+        Path(path).write_text(FILE_CACHE[path], encoding='utf-8', newline='\n')
+    DIRTY.clear()
+
 F = "packages/engine/src/proof/llm-poc-generator.ts"
 
 print("1. Replace config section (Kimi Code API + lower concurrency)...")
@@ -225,4 +248,6 @@ replace_in(F,
     )
   );''')
 
+flush()
+
 print("\n✅ Done! PoC gen now uses Kimi Code API with sequential execution + retry on 400")
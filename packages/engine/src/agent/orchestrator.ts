@@ -549,10 +549,7 @@ export async function runAgent(
 
             prBody += `\n\n<details>\n<summary>Full Security Advisory</summary>\n\n${advisory}\n\n</details>`;
 
-            const allPatchFiles: Array<{ path: string; content: string }> = [
-              ...patches.map((p) => ({ path: p.file, content: p.patchedContent })),
-              ...run.generatedPocs.map((poc) => ({ path: poc.fileName, content: poc.testCode })),
-            ];
+            const allPatchFiles = collectPrFiles(patches, run.generatedPocs);
 
             const prResult = await gh.submitFix(repo.url, {
               title: prTitle,
@@ -604,6 +601,25 @@ export async function runAgent(
   };
 }
 
+// ─── PR Files ───────────────────────────────────────────────
+
+/**
+ * One entry per path for the PR commit. Patches on the same file stack
+ * (each builds on the previous), so the last one carries every fix.
+ * Deduplicated findings share a PoC file, so the first PoC for a path wins.
+ */
+export function collectPrFiles(
+  patches: CodePatch[],
+  pocs: GeneratedPoC[],
+): Array<{ path: string; content: string }> {
+  const filesByPath = new Map<string, string>();
+  for (const p of patches) filesByPath.set(p.file, p.patchedContent);
+  for (const poc of pocs) {
+    if (!filesByPath.has(poc.fileName)) filesByPath.set(poc.fileName, poc.testCode);
+  }
+  return [...filesByPath].map(([file, content]) => ({ path: file, content }));
+}
+
 // ─── Patch Summary for Advisory ─────────────────────────────
 
 function buildPatchSummarySection(patchResult: PatchPipelineResult): string {
@@ -11,6 +11,9 @@
  * well-formed, runnable test files that reviewers can execute locally.
  */
 
+import { createHash } from "crypto";
+import { mkdir, readFile, unlink, writeFile } from "fs/promises";
+import * as path from "path";
 import type { FindingResult, ParsedProgram } from "../types";
 import type { CodePatch } from "../remediation/patcher";
 import type { EnrichedFinding } from "../llm/analyzer";
@@ -22,27 +25,64 @@ import type { EnrichedFinding } from "../llm/analyzer";
 
 type PocProvider = "kimi_code" | "moonshot";
 
+// Env-derived settings are resolved once per process; __resetPocConfig()
+// clears them so tests can switch providers.
+let _pocProvider: PocProvider | undefined;
+let _pocApiUrl: string | undefined;
+let _pocApiKey: string | null | undefined;
+let _pocModel: string | undefined;
+let _pocCacheDir: string | null | undefined;
+
+export function __resetPocConfig(): void {
+  _pocProvider = undefined;
+  _pocApiUrl = undefined;
+  _pocApiKey = undefined;
+  _pocModel = undefined;
+  _pocCacheDir = undefined;
+}
+
 function resolvePocProvider(): PocProvider {
-  const explicit = process.env.POC_PROVIDER?.toLowerCase();
-  if (explicit === "kimi_code" || explicit === "moonshot") return explicit;
-  // auto: prefer Kimi Code (separate rate-limit pool from analyzer's Moonshot)
-  return process.env.KIMI_CODE_API_KEY ? "kimi_code" : "moonshot";
+  if (_pocProvider === undefined) {
+    const explicit = process.env.POC_PROVIDER?.toLowerCase();
+    if (explicit === "kimi_code" || explicit === "moonshot") _pocProvider = explicit;
+    // auto: prefer Kimi Code (separate rate-limit pool from analyzer's Moonshot)
+    else _pocProvider = process.env.KIMI_CODE_API_KEY ? "kimi_code" : "moonshot";
+  }
+  return _pocProvider;
 }
 
 function getPocApiUrl(): string {
-  return resolvePocProvider() === "kimi_code"
-    ? "https://api.kimi.com/coding/v1/chat/completions"
-    : "https://api.moonshot.ai/v1/chat/completions";
+  if (_pocApiUrl === undefined) {
+    _pocApiUrl = resolvePocProvider() === "kimi_code"
+      ? "https://api.kimi.com/coding/v1/chat/completions"
+      : "https://api.moonshot.ai/v1/chat/completions";
+  }
+  return _pocApiUrl;
 }
 
 function getPocApiKey(): string | null {
-  const provider = resolvePocProvider();
-  if (provider === "kimi_code") return process.env.KIMI_CODE_API_KEY || null;
-  return process.env.MOONSHOT_API_KEY || null;
+  if (_pocApiKey === undefined) {
+    _pocApiKey = resolvePocProvider() === "kimi_code"
+      ? process.env.KIMI_CODE_API_KEY || null
+      : process.env.MOONSHOT_API_KEY || null;
+  }
+  return _pocApiKey;
 }
 
 function getPocModel(): string {
-  return process.env.LLM_POC_MODEL || process.env.MOONSHOT_MODEL || "kimi-k2.5";
+  if (_pocModel === undefined) {
+    _pocModel = process.env.LLM_POC_MODEL || process.env.MOONSHOT_MODEL || "kimi-k2.5";
+  }
+  return _pocModel;
+}
+
+// Response cache for pipeline re-runs; POC_CACHE_DIR="" disables it.
+function getPocCacheDir(): string | null {
+  if (_pocCacheDir === undefined) {
+    _pocCacheDir = process.env.POC_CACHE_DIR ?? ".cache/poc-llm";
+    if (!_pocCacheDir) _pocCacheDir = null;
+  }
+  return _pocCacheDir;
 }
 
 const POC_CFG = {
@@ -85,7 +125,83 @@ async function sleep(ms: number): Promise<void> {
   return new Promise((r) => setTimeout(r, ms));
 }
 
-async function callLLM(system: string, user: string): Promise<string> {
+// Transient 400 signals. Moonshot's rate limiter masquerades as a 400 with
+// an "invalid temperature" message, though we always send temperature=1.
+const TRANSIENT_400_RE = /rate limit|too many requests|overloaded|try again|temporarily|throttl|temperature/i;
+const TOKEN_LIMIT_400_RE = /max_tokens|context length|too many tokens/i;
+
+const POC_TEMPERATURE = 1;
+
+/** Start time of the latest network request; cache hits leave it untouched. */
+let lastPocRequestAt = 0;
+
+function pocCachePath(dir: string, system: string, user: string, apiUrl: string, model: string): string {
+  const key = createHash("sha256")
+    .update(system).update("\0")
+    .update(user).update("\0")
+    .update(`${apiUrl}\0${model}\0${POC_CFG.maxTokens}\0${POC_TEMPERATURE}`)
+    .digest("hex");
+  return path.join(dir, `${key}.json`);
+}
+
+/**
+ * Accumulate `delta.content` from an OpenAI-style SSE completion. When the
+ * reply opens with a ``` fence, stop (and abort the request) as soon as that
+ * block closes — nothing after the first code block is used.
+ */
+async function readCompletionStream(res: Response, controller: AbortController): Promise<string> {
+  if (!res.body) return "";
+  const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  let content = "";
+  let fenceBody = -1; // offset just past the opening fence line, once seen
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    let finished = done;
+    buffer += value ?? "";
+    const lines = buffer.split("\n");
+    // Keep a partial trailing line for the next chunk, unless the stream
+    // ended without a final newline — then that line is the last frame.
+    buffer = done ? "" : lines.pop()!;
+    for (const line of lines) {
+      if (!line.startsWith("data:")) continue;
+      const payload = line.slice(5).trim();
+      if (payload === "[DONE]") {
+        finished = true;
+        break;
+      }
+      try {
+        const delta = JSON.parse(payload).choices?.[0]?.delta?.content;
+        if (typeof delta === "string") content += delta;
+      } catch {}
+    }
+
+    if (fenceBody < 0) {
+      const open = content.match(/^\s*```[^\n]*\n/);
+      if (open) fenceBody = open[0].length;
+    }
+    if (fenceBody >= 0) {
+      const close = content.indexOf("\n```", fenceBody - 1);
+      if (close >= 0) {
+        reader.cancel().catch(() => {});
+        controller.abort();
+        return content.slice(0, close + 4);
+      }
+    }
+    if (finished) return content;
+  }
+}
+
+/**
+ * `isUsable` gates the response cache: only replies the caller can use are
+ * stored, and a cached reply that fails the check is evicted and re-fetched.
+ */
+async function callLLM(
+  system: string,
+  user: string,
+  isUsable: (content: string) => boolean = () => true,
+): Promise<string> {
   const apiKey = getPocApiKey();
   const provider = resolvePocProvider();
   const apiName = provider === "kimi_code" ? "Kimi Code" : "Moonshot";
@@ -93,6 +209,16 @@ async function callLLM(system: string, user: string): Promise<string> {
 
   const apiUrl = getPocApiUrl();
   const model = getPocModel();
+  const cacheDir = getPocCacheDir();
+  const cachePath = cacheDir ? pocCachePath(cacheDir, system, user, apiUrl, model) : null;
+  if (cachePath) {
+    try {
+      const cached = JSON.parse(await readFile(cachePath, "utf8"));
+      if (typeof cached.content === "string" && isUsable(cached.content)) return cached.content;
+      await unlink(cachePath).catch(() => {});
+    } catch {}
+  }
+
   let maxTokens = POC_CFG.maxTokens;
 
   for (let attempt = 0; attempt <= POC_CFG.retries; attempt++) {
@@ -100,6 +226,7 @@ async function callLLM(system: string, user: string): Promise<string> {
     const timer = setTimeout(() => controller.abort(), POC_CFG.timeoutMs);
 
     try {
+      lastPocRequestAt = Date.now();
       const res = await fetch(apiUrl, {
         method: "POST",
         headers: {
@@ -109,7 +236,8 @@ async function callLLM(system: string, user: string): Promise<string> {
         body: JSON.stringify({
           model,
           max_tokens: maxTokens,
-          temperature: 1,
+          temperature: POC_TEMPERATURE,
+          stream: true,
           messages: [
             { role: "system", content: system },
             { role: "user", content: user },
@@ -118,13 +246,17 @@ async function callLLM(system: string, user: string): Promise<string> {
         signal: controller.signal,
       });
 
-      clearTimeout(timer);
+      // Successful responses stay under the timeout while the stream is read.
+      if (!res.ok) clearTimeout(timer);
 
       // ── Retryable: 429 (rate-limit) and 5xx (server error) ──
       if (res.status === 429 || res.status >= 500) {
         const delay = 3000 * Math.pow(2, attempt);
         console.warn(`[poc-gen] ${apiName} ${res.status}, retry ${attempt + 1}/${POC_CFG.retries + 1} in ${delay}ms`);
         if (attempt < POC_CFG.retries) {
+          // Body is only needed for the final error; cancel it so the socket
+          // goes straight back to the keep-alive pool.
+          await res.body?.cancel().catch(() => {});
           await sleep(delay);
           continue;
         }
@@ -135,11 +267,8 @@ async function callLLM(system: string, user: string): Promise<string> {
       // ── 400: only retry if transient; fail fast otherwise ──
       if (res.status === 400) {
         const body = await res.text().catch(() => "");
-        const lower = body.toLowerCase();
 
-        // Transient signals (some providers send 400 for rate-limits)
-        const transient = ["rate limit", "overloaded", "try again", "temporarily", "throttl"];
-        if (transient.some((t) => lower.includes(t)) && attempt < POC_CFG.retries) {
+        if (TRANSIENT_400_RE.test(body) && attempt < POC_CFG.retries) {
           const delay = 3000 * Math.pow(2, attempt);
           console.warn(`[poc-gen] ${apiName} 400 (transient), retry ${attempt + 1}/${POC_CFG.retries + 1} in ${delay}ms`);
           await sleep(delay);
@@ -147,8 +276,7 @@ async function callLLM(system: string, user: string): Promise<string> {
         }
 
         // Token-limit error: downshift max_tokens and retry once
-        if ((lower.includes("max_tokens") || lower.includes("context length") || lower.includes("too many tokens"))
-            && attempt < POC_CFG.retries && maxTokens > 2048) {
+        if (TOKEN_LIMIT_400_RE.test(body) && attempt < POC_CFG.retries && maxTokens > 2048) {
           maxTokens = Math.floor(maxTokens / 2);
           console.warn(`[poc-gen] ${apiName} 400 (token limit), downshifting max_tokens to ${maxTokens}`);
           await sleep(1000);
@@ -164,8 +292,11 @@ async function callLLM(system: string, user: string): Promise<string> {
         throw new Error(`${apiName} ${res.status}: ${body}`);
       }
 
-      const data = await res.json();
-      const content = data.choices?.[0]?.message?.content;
+      // Some gateways ignore `stream: true` and return a plain completion.
+      const content = res.headers.get("content-type")?.includes("text/event-stream")
+        ? await readCompletionStream(res, controller)
+        : ((await res.json()) as any).choices?.[0]?.message?.content ?? "";
+      clearTimeout(timer);
       if (!content || content.trim().length === 0) {
         if (attempt < POC_CFG.retries) {
           await sleep(1000);
@@ -173,6 +304,14 @@ async function callLLM(system: string, user: string): Promise<string> {
         }
         throw new Error("Empty response after retries");
       }
+      if (cachePath && isUsable(content)) {
+        try {
+          await mkdir(path.dirname(cachePath), { recursive: true });
+          await writeFile(cachePath, JSON.stringify({ content }));
+        } catch (e: any) {
+          console.warn(`[poc-gen] Failed to cache response: ${e.message}`);
+        }
+      }
       return content;
     } catch (e: any) {
       clearTimeout(timer);
@@ -193,6 +332,13 @@ async function callLLM(system: string, user: string): Promise<string> {
 
 // ─── JSON Parsing ───────────────────────────────────────────
 
+/** Parsed LLM reply, or null when it carries no usable test_code. */
+function parsePoCReply(raw: string): any {
+  const parsed = robustParseJSON(raw);
+  if (parsed?.test_code && typeof parsed.test_code === "string" && parsed.test_code.length > 50) return parsed;
+  return null;
+}
+
 function robustParseJSON(raw: string): any {
   let cleaned = raw.trim();
   cleaned = cleaned.replace(/^```(?:json)?\s*/i, "").replace(/```\s*$/i, "").trim();
@@ -250,6 +396,19 @@ function pLimit(concurrency: number) {
 
 // ─── Core: Generate PoC for a single finding ────────────────
 
+function pocSafeName(finding: FindingResult): string {
+  return (finding.location.instruction || finding.className || "test")
+    .toLowerCase()
+    .replace(/[^a-z0-9_]/g, "_")
+    .slice(0, 40);
+}
+
+/** Test file path for a finding's PoC; generated and fallback PoCs must agree. */
+function pocFileName(finding: FindingResult, program: ParsedProgram): string {
+  const ext = program.framework === "anchor" ? "ts" : "rs";
+  return `tests/poc_${finding.classId}_${pocSafeName(finding)}.${ext}`;
+}
+
 const ANCHOR_POC_SYSTEM = `You are an expert Solana security researcher writing proof-of-concept exploit tests.
 You MUST output ONLY minified JSON with these exact keys:
 {
@@ -358,20 +517,14 @@ ${codeSnippet.slice(0, 2000)}
 
 Write a complete, runnable PoC test that demonstrates this vulnerability is exploitable.`;
 
-  const safeName = (finding.location.instruction || finding.className || "test")
-    .toLowerCase()
-    .replace(/[^a-z0-9_]/g, "_")
-    .slice(0, 40);
-
-  const fileName = isAnchor
-    ? `tests/poc_${finding.classId}_${safeName}.ts`
-    : `tests/poc_${finding.classId}_${safeName}.rs`;
+  const safeName = pocSafeName(finding);
+  const fileName = pocFileName(finding, program);
 
   try {
-    const raw = await callLLM(system, user);
-    const parsed = robustParseJSON(raw);
+    const raw = await callLLM(system, user, (content) => parsePoCReply(content) !== null);
+    const parsed = parsePoCReply(raw);
 
-    if (parsed?.test_code && typeof parsed.test_code === "string" && parsed.test_code.length > 50) {
+    if (parsed) {
       const reproSteps = Array.isArray(parsed.repro_steps)
         ? parsed.repro_steps.map(String).slice(0, 8)
         : finding.proofPlan?.steps || ["Deploy program", "Run exploit test", "Verify state change"];
@@ -619,40 +772,91 @@ export async function generatePoCs(
 
   console.log(`[poc-gen] Generating PoCs for ${toProcess.length} findings (LLM: ${!!apiKey})`);
 
+  const fallbackFor = (f: FindingResult): GeneratedPoC =>
+    buildFallbackPoC(f, program, program.framework === "anchor", pocFileName(f, program), pocSafeName(f));
+
   if (!apiKey) {
     // No LLM — all fallbacks
-    return toProcess.map((f) => {
-      const isAnchor = program.framework === "anchor";
-      const safeName = (f.location.instruction || f.className || "test")
-        .toLowerCase()
-        .replace(/[^a-z0-9_]/g, "_")
-        .slice(0, 40);
-      const fileName = isAnchor
-        ? `tests/poc_${f.classId}_${safeName}.ts`
-        : `tests/poc_${f.classId}_${safeName}.rs`;
-      return buildFallbackPoC(f, program, isAnchor, fileName, safeName);
-    });
+    return toProcess.map(fallbackFor);
   }
 
   // LLM-powered generation — sequential with cooldown to avoid rate-limits
   const provider = resolvePocProvider();
   const providerLabel = provider === "kimi_code" ? "Kimi Code" : "Moonshot";
   console.log(`[poc-gen] Generating via ${providerLabel} API (model: ${getPocModel()}, concurrency: ${POC_CFG.concurrency}, delay: ${POC_CFG.interRequestDelayMs}ms)`);
-  const limit = pLimit(POC_CFG.concurrency);
-
-  const results = await Promise.all(
-    toProcess.map((finding, idx) =>
-      limit(async () => {
-        // Inter-request cooldown to avoid rate-limit storms
-        if (idx > 0) await sleep(POC_CFG.interRequestDelayMs);
-        const enriched = enrichedFindings?.find(
-          (e) => e.title === finding.title || e.title.includes(finding.className)
-        );
-        const patch = patches?.find((p) => p.file === finding.location.file);
-        return generateSinglePoC(finding, program, enriched, patch);
-      })
-    )
-  );
+
+  // Index enrichment and patches once instead of scanning both per finding.
+  // First entry per key wins, matching the previous .find() order.
+  const enrichedByTitle = new Map<string, EnrichedFinding>();
+  for (const e of enrichedFindings ?? []) {
+    if (!enrichedByTitle.has(e.title)) enrichedByTitle.set(e.title, e);
+  }
+  const patchByFile = new Map<string, CodePatch>();
+  for (const p of patches ?? []) {
+    if (!patchByFile.has(p.file)) patchByFile.set(p.file, p);
+  }
+
+  const dispatch = (finding: FindingResult): Promise<GeneratedPoC> => {
+    const enriched =
+      enrichedByTitle.get(finding.title) ??
+      enrichedFindings?.find((e) => e.title.includes(finding.className));
+    const patch = patchByFile.get(finding.location.file);
+    return generateSinglePoC(finding, program, enriched, patch);
+  };
+
+  // Near-duplicates (same class and instruction in the same file within a
+  // 20-line window) share one LLM call; the PoC is fanned back out below.
+  const buckets = new Map<string, FindingResult[]>();
+  for (const f of toProcess) {
+    const key = `${f.location.file}|${f.location.instruction ?? ""}|${f.classId}|${Math.floor(f.location.line / 20)}`;
+    const group = buckets.get(key);
+    if (group) group.push(f);
+    else buckets.set(key, [f]);
+  }
+  const groups = [...buckets.values()];
+  const reps = groups.map((g) => g[0]);
+  if (reps.length < toProcess.length) {
+    console.log(`[poc-gen] Deduplicated ${toProcess.length} findings into ${reps.length} PoC requests`);
+  }
+
+  let repResults: GeneratedPoC[];
+  if (POC_CFG.concurrency <= 1) {
+    // Sequential: the cooldown is measured from the last request's start,
+    // so request starts stay at least the delay apart while response
+    // parsing and PoC post-processing overlap it. A reply served from the
+    // response cache sent no request, so it adds no wait.
+    repResults = [];
+    for (let idx = 0; idx < reps.length; idx++) {
+      repResults.push(await dispatch(reps[idx]));
+      const wait = lastPocRequestAt + POC_CFG.interRequestDelayMs - Date.now();
+      if (idx < reps.length - 1 && wait > 0) await sleep(wait);
+    }
+  } else {
+    const limit = pLimit(POC_CFG.concurrency);
+    repResults = await Promise.all(
+      reps.map((finding, idx) =>
+        limit(async () => {
+          // Inter-request cooldown to avoid rate-limit storms
+          if (idx > 0) await sleep(POC_CFG.interRequestDelayMs);
+          return dispatch(finding);
+        })
+      )
+    );
+  }
+
+  // Only a generated PoC is shared; if the representative fell back, each
+  // sibling gets its own template so it describes that finding. Siblings
+  // share the representative's fileName, and the PR writer keeps one copy.
+  const pocByFinding = new Map<FindingResult, GeneratedPoC>();
+  groups.forEach((group, i) => {
+    const poc = repResults[i];
+    for (const f of group) {
+      if (f === group[0]) pocByFinding.set(f, poc);
+      else if (poc.status === "generated") pocByFinding.set(f, { ...poc, findingTitle: f.title, severity: f.severity });
+      else pocByFinding.set(f, fallbackFor(f));
+    }
+  });
+  const results = toProcess.map((f) => pocByFinding.get(f)!);
 
   const generated = results.filter((r) => r.status === "generated").length;
   const fallback = results.filter((r) => r.status === "fallback").length;
@@ -0,0 +1,298 @@
+import { describe, it, expect, beforeEach, afterEach, vi } from "vitest";
+import { mkdtempSync, readdirSync, rmSync } from "fs";
+import { tmpdir } from "os";
+import { join } from "path";
+import { generatePoCs, __resetPocConfig } from "../src/proof/llm-poc-generator";
+import type { FindingResult, ParsedProgram } from "../src/types";
+
+const ENV_KEYS = ["POC_PROVIDER", "KIMI_CODE_API_KEY", "MOONSHOT_API_KEY", "LLM_POC_MODEL", "POC_CACHE_DIR"];
+
+const program = {
+  name: "basic",
+  framework: "anchor",
+  files: [],
+  instructions: [],
+  accounts: [],
+  cpiCalls: [],
+  pdaDerivations: [],
+  errorCodes: [],
+} as ParsedProgram;
+
+function finding(overrides: Partial<FindingResult> = {}): FindingResult {
+  return {
+    classId: 1,
+    className: "missing_signer",
+    severity: "CRITICAL",
+    title: "Missing signer on withdraw",
+    location: { file: "programs/basic/src/lib.rs", line: 10, instruction: "withdraw" },
+    confidence: 0.9,
+    hypothesis: "authority is not required to sign",
+    ...overrides,
+  };
+}
+
+const POC_JSON = JSON.stringify({
+  test_code: `describe("PoC#1: missing_signer", () => { it("exploits", async () => {}); });`,
+  repro_steps: ["call withdraw without signer"],
+  pre_state: "vault funded",
+  post_state: "vault drained",
+  assertion: "attacker withdrew funds",
+});
+
+/** Stream `deltas` as an OpenAI-style SSE completion. */
+function llmResponse(deltas: string[] = [POC_JSON.slice(0, 40), POC_JSON.slice(40)]): Response {
+  const frames = deltas
+    .map((content) => `data: ${JSON.stringify({ choices: [{ delta: { content } }] })}\n\n`)
+    .join("");
+  return new Response(`${frames}data: [DONE]\n\n`, {
+    status: 200,
+    headers: { "content-type": "text/event-stream" },
+  });
+}
+
+describe("LLM PoC Generator", () => {
+  const saved: Record<string, string | undefined> = {};
+
+  beforeEach(() => {
+    for (const k of ENV_KEYS) {
+      saved[k] = process.env[k];
+      delete process.env[k];
+    }
+    process.env.POC_CACHE_DIR = "";
+    __resetPocConfig();
+  });
+
+  afterEach(() => {
+    for (const k of ENV_KEYS) {
+      if (saved[k] === undefined) delete process.env[k];
+      else process.env[k] = saved[k];
+    }
+    vi.unstubAllGlobals();
+    __resetPocConfig();
+  });
+
+  it("falls back to template PoCs when no API key is set", async () => {
+    const fetchMock = vi.fn();
+    vi.stubGlobal("fetch", fetchMock);
+
+    const pocs = await generatePoCs([finding()], program);
+    expect(pocs).toHaveLength(1);
+    expect(pocs[0].status).toBe("fallback");
+    expect(fetchMock).not.toHaveBeenCalled();
+  });
+
+  it("names fallback and generated PoC files identically", async () => {
+    const fallback = await generatePoCs([finding()], program);
+    process.env.MOONSHOT_API_KEY = "test-key";
+    __resetPocConfig();
+    vi.stubGlobal("fetch", vi.fn(async (_url: string, _init?: RequestInit) => llmResponse()));
+    const generated = await generatePoCs([finding()], program);
+
+    expect(generated[0].status).toBe("generated");
+    expect(fallback[0].fileName).toBe("tests/poc_1_withdraw.ts");
+    expect(generated[0].fileName).toBe(fallback[0].fileName);
+  });
+
+  it("skips non-actionable findings", async () => {
+    const pocs = await generatePoCs([finding({ severity: "LOW" }), finding({ confidence: 0.3 })], program);
+    expect(pocs).toHaveLength(0);
+  });
+
+  it("memoizes provider config until __resetPocConfig()", async () => {
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse());
+    vi.stubGlobal("fetch", fetchMock);
+
+    await generatePoCs([finding()], program);
+    process.env.KIMI_CODE_API_KEY = "test-key";
+    const cached = await generatePoCs([finding()], program);
+    expect(cached[0].status).toBe("fallback");
+    expect(fetchMock).not.toHaveBeenCalled();
+
+    __resetPocConfig();
+    const fresh = await generatePoCs([finding()], program);
+    expect(fresh[0].status).toBe("generated");
+    expect(fetchMock).toHaveBeenCalledTimes(1);
+    expect(fetchMock.mock.calls[0][0]).toBe("https://api.kimi.com/coding/v1/chat/completions");
+  });
+
+  it("serves repeated prompts from the response cache", async () => {
+    const cacheDir = mkdtempSync(join(tmpdir(), "poc-cache-"));
+    process.env.POC_CACHE_DIR = cacheDir;
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse());
+    vi.stubGlobal("fetch", fetchMock);
+
+    try {
+      const first = await generatePoCs([finding()], program);
+      const second = await generatePoCs([finding()], program);
+      expect(fetchMock).toHaveBeenCalledTimes(1);
+      expect(readdirSync(cacheDir)).toHaveLength(1);
+      expect(second[0].status).toBe("generated");
+      expect(second[0].testCode).toBe(first[0].testCode);
+    } finally {
+      rmSync(cacheDir, { recursive: true, force: true });
+    }
+  });
+
+  it("does not cache replies without usable test_code", async () => {
+    const cacheDir = mkdtempSync(join(tmpdir(), "poc-cache-"));
+    process.env.POC_CACHE_DIR = cacheDir;
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse(["I cannot help with that."]));
+    vi.stubGlobal("fetch", fetchMock);
+
+    try {
+      const first = await generatePoCs([finding()], program);
+      const second = await generatePoCs([finding()], program);
+      expect(first[0].status).toBe("fallback");
+      expect(second[0].status).toBe("fallback");
+      expect(fetchMock).toHaveBeenCalledTimes(2);
+      expect(readdirSync(cacheDir)).toHaveLength(0);
+    } finally {
+      rmSync(cacheDir, { recursive: true, force: true });
+    }
+  });
+
+  it("keys the response cache by provider endpoint", async () => {
+    const cacheDir = mkdtempSync(join(tmpdir(), "poc-cache-"));
+    process.env.POC_CACHE_DIR = cacheDir;
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse());
+    vi.stubGlobal("fetch", fetchMock);
+
+    try {
+      await generatePoCs([finding()], program);
+      process.env.POC_PROVIDER = "kimi_code";
+      process.env.KIMI_CODE_API_KEY = "test-key";
+      __resetPocConfig();
+      await generatePoCs([finding()], program);
+
+      expect(fetchMock.mock.calls.map((c) => c[0])).toEqual([
+        "https://api.moonshot.ai/v1/chat/completions",
+        "https://api.kimi.com/coding/v1/chat/completions",
+      ]);
+      expect(readdirSync(cacheDir)).toHaveLength(2);
+    } finally {
+      rmSync(cacheDir, { recursive: true, force: true });
+    }
+  });
+
+  it("skips the inter-request cooldown for cached replies", async () => {
+    const cacheDir = mkdtempSync(join(tmpdir(), "poc-cache-"));
+    process.env.POC_CACHE_DIR = cacheDir;
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse());
+    vi.stubGlobal("fetch", fetchMock);
+    vi.useFakeTimers({ toFake: ["Date"] });
+
+    const file = "programs/basic/src/lib.rs";
+    const a = finding({ title: "Missing signer on withdraw", location: { file, line: 41, instruction: "withdraw" } });
+    const b = finding({ title: "Missing signer on deposit", location: { file, line: 44, instruction: "deposit" } });
+    try {
+      await generatePoCs([a], program);
+      await generatePoCs([b], program);
+      vi.setSystemTime(Date.now() + 60_000); // well past the last request's cooldown
+
+      const started = performance.now();
+      const pocs = await generatePoCs([a, b], program);
+      expect(performance.now() - started).toBeLessThan(1000);
+      expect(fetchMock).toHaveBeenCalledTimes(2);
+      expect(pocs.every((p) => p.status === "generated")).toBe(true);
+    } finally {
+      vi.useRealTimers();
+      rmSync(cacheDir, { recursive: true, force: true });
+    }
+  });
+
+  it("sends one LLM request per near-duplicate bucket and fans the PoC out", async () => {
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse());
+    vi.stubGlobal("fetch", fetchMock);
+
+    const a = finding({ title: "Missing signer (a)", location: { file: "programs/basic/src/lib.rs", line: 41 } });
+    const b = finding({ title: "Missing signer (b)", location: { file: "programs/basic/src/lib.rs", line: 44 } });
+    const pocs = await generatePoCs([a, b], program);
+
+    expect(fetchMock).toHaveBeenCalledTimes(1);
+    expect(pocs.map((p) => p.findingTitle)).toEqual([a.title, b.title]);
+    expect(pocs[1].testCode).toBe(pocs[0].testCode);
+    expect(pocs.every((p) => p.status === "generated")).toBe(true);
+  });
+
+  it("keeps findings in different instructions in separate buckets", async () => {
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse());
+    vi.stubGlobal("fetch", fetchMock);
+
+    const file = "programs/basic/src/lib.rs";
+    const a = finding({ title: "Missing signer on withdraw", location: { file, line: 41, instruction: "withdraw" } });
+    const b = finding({ title: "Missing signer on deposit", location: { file, line: 44, instruction: "deposit" } });
+    const pocs = await generatePoCs([a, b], program);
+
+    expect(fetchMock).toHaveBeenCalledTimes(2);
+    expect(pocs.map((p) => p.findingTitle)).toEqual([a.title, b.title]);
+  });
+
+  it("builds a per-finding fallback for siblings when the LLM reply is unusable", async () => {
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) => llmResponse(["I cannot help with that."]));
+    vi.stubGlobal("fetch", fetchMock);
+
+    const a = finding({ title: "Missing signer (a)", location: { file: "programs/basic/src/lib.rs", line: 41 } });
+    const b = finding({ title: "Missing signer (b)", location: { file: "programs/basic/src/lib.rs", line: 44 } });
+    const pocs = await generatePoCs([a, b], program);
+
+    expect(fetchMock).toHaveBeenCalledTimes(1);
+    expect(pocs.every((p) => p.status === "fallback")).toBe(true);
+    expect(pocs[0].testCode).toContain(a.title);
+    expect(pocs[1].testCode).toContain(b.title);
+    expect(pocs[1].testCode).not.toContain(a.title);
+  });
+
+  it("reads a non-streamed JSON completion", async () => {
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(
+      async (_url: string, _init?: RequestInit) =>
+        new Response(JSON.stringify({ choices: [{ message: { content: POC_JSON } }] }), {
+          status: 200,
+          headers: { "content-type": "application/json" },
+        }),
+    );
+    vi.stubGlobal("fetch", fetchMock);
+
+    const pocs = await generatePoCs([finding()], program);
+    expect(pocs[0].status).toBe("generated");
+    expect(pocs[0].testCode).toContain("PoC#1");
+  });
+
+  it("stops reading the stream once a fenced reply closes", async () => {
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const fetchMock = vi.fn(async (_url: string, _init?: RequestInit) =>
+      llmResponse(["```json\n", POC_JSON, "\n```", "\nTrailing commentary that is never used."]),
+    );
+    vi.stubGlobal("fetch", fetchMock);
+
+    const pocs = await generatePoCs([finding()], program);
+    expect(pocs[0].status).toBe("generated");
+    expect(pocs[0].testCode).toContain("PoC#1");
+    expect(JSON.parse(String(fetchMock.mock.calls[0][1]?.body)).stream).toBe(true);
+    expect(fetchMock.mock.calls[0][1]?.signal?.aborted).toBe(true);
+  });
+
+  it("keeps the last delta of a stream that ends without a newline or [DONE]", async () => {
+    process.env.MOONSHOT_API_KEY = "test-key";
+    const frame = (content: string) => `data: ${JSON.stringify({ choices: [{ delta: { content } }] })}`;
+    const fetchMock = vi.fn(
+      async (_url: string, _init?: RequestInit) =>
+        new Response(`${frame(POC_JSON.slice(0, 40))}\n\n${frame(POC_JSON.slice(40))}`, {
+          status: 200,
+          headers: { "content-type": "text/event-stream" },
+        }),
+    );
+    vi.stubGlobal("fetch", fetchMock);
+
+    const pocs = await generatePoCs([finding()], program);
+    expect(pocs[0].status).toBe("generated");
+    expect(pocs[0].testCode).toContain("PoC#1");
+  });
+});
@@ -0,0 +1,48 @@
+import { describe, it, expect } from "vitest";
+import { collectPrFiles } from "../src/agent/orchestrator";
+import type { CodePatch } from "../src/remediation/patcher";
+import type { GeneratedPoC } from "../src/proof/llm-poc-generator";
+
+function patch(file: string, originalContent: string, patchedContent: string): CodePatch {
+  return { file, originalContent, patchedContent, diff: "", description: "fix" };
+}
+
+function poc(fileName: string, testCode: string): GeneratedPoC {
+  return {
+    findingTitle: testCode,
+    classId: 1,
+    severity: "CRITICAL",
+    framework: "anchor",
+    testCode,
+    fileName,
+    reproSteps: [],
+    stateComparison: { preState: "", postState: "", assertion: "" },
+    runCommand: "",
+    status: "generated",
+  };
+}
+
+describe("collectPrFiles", () => {
+  it("commits the last of stacked patches on one file", () => {
+    const lib = "programs/basic/src/lib.rs";
+    const original = "fn withdraw() {}\nfn deposit() {}\n";
+    const first = "fn withdraw() { signer!(); }\nfn deposit() {}\n";
+    const second = "fn withdraw() { signer!(); }\nfn deposit() { owner!(); }\n";
+
+    const files = collectPrFiles([patch(lib, original, first), patch(lib, first, second)], []);
+    expect(files).toEqual([{ path: lib, content: second }]);
+  });
+
+  it("commits one copy of a PoC file shared by deduplicated findings", () => {
+    const files = collectPrFiles(
+      [patch("programs/basic/src/lib.rs", "a", "b")],
+      [poc("tests/poc_1_withdraw.ts", "rep"), poc("tests/poc_1_withdraw.ts", "sibling"), poc("tests/poc_2_deposit.ts", "other")],
+    );
+    expect(files.map((f) => f.path)).toEqual([
+      "programs/basic/src/lib.rs",
+      "tests/poc_1_withdraw.ts",
+      "tests/poc_2_deposit.ts",
+    ]);
+    expect(files[1].content).toBe("rep");
+  });
+});
@@ -1,4 +1,5 @@
 import { Octokit } from "@octokit/rest";
+import { createHash } from "crypto";
 
 export interface RepoRef { owner: string; repo: string; }
 export interface PatchFile { path: string; content: string; }
@@ -10,14 +11,140 @@ export interface RepoInfo {
   defaultBranch: string; updatedAt: string; htmlUrl: string;
 }
 
+/**
+ * Longest total time withRetry will sleep. It runs inline in the audit job,
+ * so a longer wait (e.g. an exhausted hourly quota) fails fast instead.
+ */
+const RETRY_MAX_WAIT_MS = 120_000;
+
+/**
+ * Retry GitHub rate-limit rejections (403 "rate limit" / 429), waiting as
+ * long as GitHub asks: `retry-after` if sent, else until `x-ratelimit-reset`
+ * when the primary quota is exhausted, else at least a minute (GitHub's
+ * guidance for secondary limits) plus jitter. If the waits would exceed
+ * `maxWaitMs` in total, the rejection is rethrown immediately.
+ *
+ * 5xx is deliberately not retried: the wrapped calls are non-idempotent
+ * POSTs (gists.create), and a 5xx may still have created the resource.
+ */
+export async function withRetry<T>(
+  fn: () => Promise<T>,
+  tries: number = 3,
+  maxWaitMs: number = RETRY_MAX_WAIT_MS,
+): Promise<T> {
+  let waited = 0;
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fn();
+    } catch (e: any) {
+      const status: number | undefined = e.status;
+      const rateLimited = status === 429 || (status === 403 && /rate limit/i.test(e.message || ""));
+      if (!rateLimited || attempt >= tries - 1) throw e;
+      const delay = rateLimitDelayMs(e.response?.headers ?? {}, attempt);
+      if (waited + delay > maxWaitMs) {
+        console.warn(`[github] ${status} rate limited for ${delay}ms, over the ${maxWaitMs}ms retry budget; giving up`);
+        throw e;
+      }
+      console.warn(`[github] ${status} rate limited, retry ${attempt + 1}/${tries - 1} in ${delay}ms`);
+      await new Promise((r) => setTimeout(r, delay));
+      waited += delay;
+    }
+  }
+}
+
+function rateLimitDelayMs(headers: Record<string, string | number | undefined>, attempt: number): number {
+  const retryAfter = Number(headers["retry-after"]);
+  if (Number.isFinite(retryAfter) && retryAfter > 0) return retryAfter * 1000;
+
+  const reset = Number(headers["x-ratelimit-reset"]);
+  if (String(headers["x-ratelimit-remaining"]) === "0" && Number.isFinite(reset)) {
+    return Math.max(1000, reset * 1000 - Date.now() + 1000);
+  }
+
+  const base = 60_000 * 2 ** attempt;
+  return Math.round(base + Math.random() * 10_000);
+}
+
+/** Published-writeup cache bounds: entries expire so a deleted gist is not served forever. */
+const GIST_CACHE_TTL_MS = 60 * 60 * 1000;
+const GIST_CACHE_MAX = 100;
+
+/** Gist payloads are rejected past ~1 MB; keep each file comfortably under. */
+const GIST_SHARD_BYTES = 900_000;
+
+/**
+ * Split a markdown writeup into `-partN.md` files of at most `max` bytes,
+ * cutting before "## " headings so PoC code blocks stay intact. Sections
+ * that are still too large fall back to line (then character) boundaries.
+ */
+export function shardWriteup(
+  filename: string,
+  md: string,
+  max: number = GIST_SHARD_BYTES,
+): Record<string, { content: string }> {
+  if (Buffer.byteLength(md, "utf8") <= max) return { [filename]: { content: md } };
+
+  const pieces: string[] = [];
+  for (const section of md.split(/(?=\n## )/)) {
+    if (Buffer.byteLength(section, "utf8") <= max) {
+      pieces.push(section);
+      continue;
+    }
+    for (const line of section.split(/(?<=\n)/)) {
+      if (Buffer.byteLength(line, "utf8") <= max) {
+        pieces.push(line);
+        continue;
+      }
+      // A UTF-16 code unit never encodes to more than 3 bytes. Never end a
+      // piece on a high surrogate, or both halves of the pair become U+FFFD.
+      const step = Math.floor(max / 3);
+      for (let i = 0; i < line.length; ) {
+        let end = Math.min(i + step, line.length);
+        const last = line.charCodeAt(end - 1);
+        if (end < line.length && end - i > 1 && last >= 0xd800 && last <= 0xdbff) end--;
+        pieces.push(line.slice(i, end));
+        i = end;
+      }
+    }
+  }
+
+  const parts: string[] = [];
+  let current = "";
+  let currentBytes = 0;
+  for (const piece of pieces) {
+    const bytes = Buffer.byteLength(piece, "utf8");
+    if (currentBytes + bytes > max && current) {
+      parts.push(current);
+      current = "";
+      currentBytes = 0;
+    }
+    current += piece;
+    currentBytes += bytes;
+  }
+  if (current) parts.push(current);
+
+  const base = filename.replace(/\.md$/, "");
+  const files: Record<string, { content: string }> = {};
+  parts.forEach((content, i) => {
+    files[`${base}-part${i + 1}.md`] = { content };
+  });
+  return files;
+}
+
 export class GitHubClient {
   private octokit: Octokit;
   private authenticatedUser: string | null = null;
+  /** Token fingerprint; scopes cached gists to the account that owns them. */
+  private tokenId: string;
+  // Static: the orchestrator builds a fresh client per repo, and a retried
+  // publish of the same writeup should reuse the gist rather than re-POST.
+  private static gistCache = new Map<string, { gistUrl: string; rawUrl: string; createdAt: number }>();
 
   constructor(token?: string) {
     const t = token || process.env.GITHUB_TOKEN;
     if (!t) throw new Error("GITHUB_TOKEN required");
     this.octokit = new Octokit({ auth: t });
+    this.tokenId = createHash("sha256").update(t).digest("hex").slice(0, 16);
   }
 
   private async getUser(): Promise<string> {
@@ -230,12 +357,26 @@ export class GitHubClient {
     description: string,
     isPublic: boolean = true,
   ): Promise<{ gistUrl: string; rawUrl: string; gistId: string }> {
-    const { data } = await this.octokit.gists.create({
-      description,
-      public: isPublic,
-      files: { [filename]: { content } },
-    });
-    const file = data.files?.[filename];
+    return this.createGistFiles({ [filename]: { content } }, description, isPublic);
+  }
+
+  /**
+   * Create a (possibly multi-file) Gist in a single API call.
+   * `rawUrl` points at the first file.
+   */
+  private async createGistFiles(
+    files: Record<string, { content: string }>,
+    description: string,
+    isPublic: boolean,
+  ): Promise<{ gistUrl: string; rawUrl: string; gistId: string }> {
+    const { data } = await withRetry(() =>
+      this.octokit.gists.create({
+        description,
+        public: isPublic,
+        files,
+      }),
+    );
+    const file = data.files?.[Object.keys(files)[0]];
     return {
       gistUrl: data.html_url || "",
       rawUrl: file?.raw_url || "",
@@ -252,12 +393,29 @@ export class GitHubClient {
     repoName: string,
     writeupMarkdown: string,
   ): Promise<{ gistUrl: string; rawUrl: string }> {
+    const hash = createHash("sha1").update(writeupMarkdown).digest("hex");
+    const cacheKey = `${this.tokenId}/${repoOwner}/${repoName}/${hash}`;
+    const cache = GitHubClient.gistCache;
+    const cached = cache.get(cacheKey);
+    if (cached && Date.now() - cached.createdAt < GIST_CACHE_TTL_MS) {
+      console.log(`[github] Writeup gist (cached): ${cached.gistUrl}`);
+      return { gistUrl: cached.gistUrl, rawUrl: cached.rawUrl };
+    }
+    if (cached) cache.delete(cacheKey);
+
     const filename = `solaudit-${repoOwner}-${repoName}-writeup.md`;
     const description = `[SolAudit] Security audit writeup for ${repoOwner}/${repoName}`;
-    console.log(`[github] Publishing writeup gist: ${filename}`);
-    const result = await this.createGist(filename, writeupMarkdown, description, true);
-    console.log(`[github] Writeup gist: ${result.gistUrl}`);
-    return result;
+    const files = shardWriteup(filename, writeupMarkdown);
+    const count = Object.keys(files).length;
+    console.log(`[github] Publishing writeup gist: ${filename}${count > 1 ? ` (${count} parts)` : ""}`);
+    const { gistUrl, rawUrl } = await this.createGistFiles(files, description, true);
+    console.log(`[github] Writeup gist: ${gistUrl}`);
+    if (gistUrl) {
+      // Maps iterate in insertion order, so the first key is the oldest.
+      if (cache.size >= GIST_CACHE_MAX) cache.delete(cache.keys().next().value!);
+      cache.set(cacheKey, { gistUrl, rawUrl, createdAt: Date.now() });
+    }
+    return { gistUrl, rawUrl };
   }
 
   /**
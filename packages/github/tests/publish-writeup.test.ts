@@ -0,0 +1,63 @@
+import { describe, it, expect, beforeEach, afterEach, vi } from "vitest";
+
+const { create } = vi.hoisted(() => ({ create: vi.fn() }));
+
+vi.mock("@octokit/rest", () => ({
+  Octokit: class {
+    gists = { create };
+  },
+}));
+
+import { GitHubClient } from "../src/index";
+
+let n = 0;
+/** A writeup no earlier test has published, since the gist cache is process-wide. */
+const freshWriteup = () => `# Writeup ${++n}\n`;
+
+describe("GitHubClient.publishWriteup", () => {
+  beforeEach(() => {
+    create.mockReset();
+    create.mockImplementation(async ({ files }: { files: Record<string, unknown> }) => ({
+      data: {
+        id: `gist${create.mock.calls.length}`,
+        html_url: `https://gist.github.com/gist${create.mock.calls.length}`,
+        files: Object.fromEntries(Object.keys(files).map((f) => [f, { raw_url: `https://raw/${f}` }])),
+      },
+    }));
+    vi.spyOn(console, "log").mockImplementation(() => {});
+  });
+
+  afterEach(() => {
+    vi.useRealTimers();
+    vi.restoreAllMocks();
+  });
+
+  it("reuses the gist when the same account republishes a writeup", async () => {
+    const md = freshWriteup();
+    const first = await new GitHubClient("token-a").publishWriteup("acme", "vault", md);
+    const second = await new GitHubClient("token-a").publishWriteup("acme", "vault", md);
+
+    expect(create).toHaveBeenCalledTimes(1);
+    expect(second).toEqual(first);
+  });
+
+  it("does not share cached gists across tokens", async () => {
+    const md = freshWriteup();
+    const a = await new GitHubClient("token-a").publishWriteup("acme", "vault", md);
+    const b = await new GitHubClient("token-b").publishWriteup("acme", "vault", md);
+
+    expect(create).toHaveBeenCalledTimes(2);
+    expect(b.gistUrl).not.toBe(a.gistUrl);
+  });
+
+  it("republishes once the cached entry expires", async () => {
+    vi.useFakeTimers();
+    const md = freshWriteup();
+    const client = new GitHubClient("token-a");
+    await client.publishWriteup("acme", "vault", md);
+    vi.setSystemTime(Date.now() + 61 * 60 * 1000);
+    await client.publishWriteup("acme", "vault", md);
+
+    expect(create).toHaveBeenCalledTimes(2);
+  });
+});
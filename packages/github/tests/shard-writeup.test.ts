@@ -0,0 +1,49 @@
+import { describe, it, expect } from "vitest";
+import { shardWriteup } from "../src/index";
+
+const bytes = (s: string) => Buffer.byteLength(s, "utf8");
+
+function contents(files: Record<string, { content: string }>): string[] {
+  return Object.values(files).map((f) => f.content);
+}
+
+describe("shardWriteup", () => {
+  it("returns a single file when the writeup fits", () => {
+    const md = "# Audit\n\n## Finding 1\nbody\n";
+    expect(shardWriteup("w.md", md, 1000)).toEqual({ "w.md": { content: md } });
+  });
+
+  it("splits at ## headings into numbered parts", () => {
+    const section = (n: number) => `\n## Finding ${n}\n${"x".repeat(40)}\n`;
+    const md = `# Audit${section(1)}${section(2)}${section(3)}`;
+    const files = shardWriteup("w.md", md, 80);
+
+    expect(Object.keys(files)).toEqual(["w-part1.md", "w-part2.md", "w-part3.md"]);
+    const parts = contents(files);
+    expect(parts.join("")).toBe(md);
+    expect(parts.slice(1).every((p) => p.startsWith("\n## Finding"))).toBe(true);
+    expect(parts.every((p) => bytes(p) <= 80)).toBe(true);
+  });
+
+  it("falls back to line boundaries for an oversized section", () => {
+    const md = `## Finding\n${Array.from({ length: 20 }, (_, i) => `line ${i}\n`).join("")}`;
+    const parts = contents(shardWriteup("w.md", md, 30));
+
+    expect(parts.length).toBeGreaterThan(1);
+    expect(parts.join("")).toBe(md);
+    expect(parts.every((p) => bytes(p) <= 30 && p.endsWith("\n"))).toBe(true);
+  });
+
+  it("cuts an oversized line without splitting surrogate pairs", () => {
+    const line = "ab" + "😀".repeat(20) + "é€".repeat(10);
+    const parts = contents(shardWriteup("w.md", line, 9));
+
+    expect(parts.length).toBeGreaterThan(1);
+    expect(parts.join("")).toBe(line);
+    for (const p of parts) {
+      expect(bytes(p)).toBeLessThanOrEqual(9);
+      expect(p).not.toMatch(/[\ud800-\udbff]$/);
+      expect(Buffer.from(p, "utf8").toString("utf8")).toBe(p);
+    }
+  });
+});
@@ -0,0 +1,56 @@
+import { describe, it, expect, afterEach, vi } from "vitest";
+import { withRetry } from "../src/index";
+
+function rateLimitError(status: number, headers: Record<string, string> = {}, message = "API rate limit exceeded") {
+  return Object.assign(new Error(message), { status, response: { headers } });
+}
+
+describe("withRetry", () => {
+  afterEach(() => {
+    vi.useRealTimers();
+    vi.restoreAllMocks();
+  });
+
+  it("waits for retry-after and then succeeds", async () => {
+    vi.useFakeTimers();
+    vi.spyOn(console, "warn").mockImplementation(() => {});
+    const fn = vi
+      .fn()
+      .mockRejectedValueOnce(rateLimitError(429, { "retry-after": "2" }))
+      .mockResolvedValueOnce("ok");
+
+    const result = withRetry(fn);
+    await vi.advanceTimersByTimeAsync(1999);
+    expect(fn).toHaveBeenCalledTimes(1);
+    await vi.advanceTimersByTimeAsync(1);
+    await expect(result).resolves.toBe("ok");
+    expect(fn).toHaveBeenCalledTimes(2);
+  });
+
+  it("gives up immediately when retry-after exceeds the wait budget", async () => {
+    vi.spyOn(console, "warn").mockImplementation(() => {});
+    const err = rateLimitError(429, { "retry-after": "3600" });
+    const fn = vi.fn().mockRejectedValue(err);
+
+    await expect(withRetry(fn)).rejects.toBe(err);
+    expect(fn).toHaveBeenCalledTimes(1);
+  });
+
+  it("gives up immediately when the primary quota resets too far out", async () => {
+    vi.spyOn(console, "warn").mockImplementation(() => {});
+    const reset = String(Math.floor(Date.now() / 1000) + 3600);
+    const err = rateLimitError(403, { "x-ratelimit-remaining": "0", "x-ratelimit-reset": reset });
+    const fn = vi.fn().mockRejectedValue(err);
+
+    await expect(withRetry(fn)).rejects.toBe(err);
+    expect(fn).toHaveBeenCalledTimes(1);
+  });
+
+  it("does not retry 5xx or non-rate-limit 403s", async () => {
+    for (const err of [rateLimitError(502, {}, "Bad Gateway"), rateLimitError(403, {}, "Resource not accessible")]) {
+      const fn = vi.fn().mockRejectedValue(err);
+      await expect(withRetry(fn)).rejects.toBe(err);
+      expect(fn).toHaveBeenCalledTimes(1);
+    }
+  });
+});